@@ -0,0 +1,111 @@
+"""
+Compares the schema decoders with the loops that used to build the models in itau_service.
+Both sides parse the same payload with the standard library json module, so only the
+decoding is measured. Run from the itauscraper folder: python benchmarks/decoders_benchmark.py
+"""
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.formatter_helper import brl_str_to_float  # noqa: E402
+from models.bank_model import AccountStatement, Asset, Investment, Statement  # noqa: E402
+from models.payload_model import decode_account_statement, decode_investments  # noqa: E402
+
+STATEMENTS = 200_000
+INVESTMENTS = 4_000
+ASSETS_PER_INVESTMENT = 50
+
+
+def baseline_statement(response_body: dict) -> AccountStatement:
+    statements = []
+    for statement in response_body['lancamentos']:
+        date = statement['dataLancamento']
+        amount = statement['valorLancamento']
+        description = statement['descricaoLancamento']
+        incoming_amount = statement['ePositivo']
+        skip_description = ['SDO CTA/APL AUTOMATICAS', 'SALDO DO DIA']
+        if date is None or amount is None or description in skip_description:
+            continue
+        statements.append(
+            Statement(
+                date=date,
+                description=description if description is not None else '###',
+                value=brl_str_to_float(amount),
+                type='entrada' if incoming_amount else 'saida'
+            )
+        )
+    balance = response_body['saldoResumido']["saldoContaCorrente"]["valor"]
+    return AccountStatement(
+        available_balance=float(balance.replace('.', '').replace(',', '.')),
+        transactions=statements
+    )
+
+
+def baseline_investments(investments: list) -> list[Investment]:
+    result = []
+    for investment in investments:
+        result.append(
+            Investment(
+                category=investment["subLista"][0]["tipoInvestimento"] if 'tipoInvestimento' in investment["subLista"][0] else 'Unknown',
+                amount=investment['valorParaGrafico'] if 'valorParaGrafico' in investment else 0.0,
+                percentage=investment['percentualTotal'] if 'percentualTotal' in investment else 0.0,
+                assets=[
+                    Asset(
+                        code=asset['codigoProduto'] if 'codigoProduto' in asset else 'Unknown',
+                        name=asset['nomeProduto'] if 'nomeProduto' in asset else 'Unknown',
+                        amount=asset['valorInvestidoGrafico'] if 'valorInvestidoGrafico' in asset else 0.0,
+                    ) for asset in investment['subLista']
+                ]
+            )
+        )
+    return result
+
+
+def statement_payload() -> str:
+    descriptions = ['PIX TRANSF JOAO', 'SALDO DO DIA', 'TED 123', 'PAG BOLETO', 'SDO CTA/APL AUTOMATICAS']
+    return json.dumps({
+        'saldoResumido': {'saldoContaCorrente': {'valor': '1.234,56'}},
+        'lancamentos': [{
+            'dataLancamento': '01/07/2023',
+            'valorLancamento': f'{random.randint(1, 9999)},{random.randint(10, 99)}',
+            'descricaoLancamento': random.choice(descriptions),
+            'ePositivo': random.random() > 0.5,
+        } for _ in range(STATEMENTS)]
+    })
+
+
+def investments_payload() -> str:
+    return json.dumps([{
+        'tipoOrdenado': 'rendafixa',
+        'valorParaGrafico': random.random() * 10000,
+        'percentualTotal': '10,0',
+        'subLista': [{
+            'tipoInvestimento': 'CDB',
+            'codigoProduto': f'CDB{asset}',
+            'nomeProduto': 'CDB ITAU',
+            'valorInvestidoGrafico': random.random() * 1000,
+        } for asset in range(ASSETS_PER_INVESTMENT)]
+    } for _ in range(INVESTMENTS)])
+
+
+def compare(name: str, baseline, decoder, payload: str, repeat: int = 15) -> None:
+    data = json.loads(payload)
+    if baseline(data) != decoder(data):
+        raise AssertionError(f'{name}: decoder result differs from the baseline')
+    # runs alternate between both sides so a busy machine slows them down alike, the best run of each is kept
+    old, new = float('inf'), float('inf')
+    for _ in range(repeat):
+        old = min(old, timeit.timeit(lambda: baseline(json.loads(payload)), number=1))
+        new = min(new, timeit.timeit(lambda: decoder(json.loads(payload)), number=1))
+    print(f'{name}: baseline {old * 1000:.0f} ms, decoder {new * 1000:.0f} ms ({old / new:.2f}x)')
+
+if __name__ == '__main__':
+    random.seed(1)
+    compare(f'account statement ({STATEMENTS} lancamentos)',
+            baseline_statement, decode_account_statement, statement_payload())
+    compare(f'investments ({INVESTMENTS} x {ASSETS_PER_INVESTMENT} assets)',
+            baseline_investments, decode_investments, investments_payload())
@@ -0,0 +1,206 @@
+import json
+from dataclasses import dataclass, fields as dataclass_fields, is_dataclass
+from itertools import repeat
+from operator import itemgetter
+from typing import Any, Callable
+
+class JsonDecodeException(Exception):
+    pass
+
+
+try:
+    import orjson
+
+    def loads(payload: str | bytes):
+        """Parse a json payload using orjson when it is installed"""
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError as error:
+            raise JsonDecodeException(str(error)) from error
+except ImportError:
+    try:
+        import msgspec
+
+        _msgspec_decoder = msgspec.json.Decoder()
+
+        def loads(payload: str | bytes):
+            """Parse a json payload using msgspec when it is installed"""
+            try:
+                return _msgspec_decoder.decode(payload)
+            except msgspec.DecodeError as error:
+                raise JsonDecodeException(str(error)) from error
+    except ImportError:
+        def loads(payload: str | bytes):
+            """Parse a json payload using the standard library"""
+            try:
+                return json.loads(payload)
+            except ValueError as error:
+                # json.JSONDecodeError, or UnicodeDecodeError for bytes that are not utf-8
+                raise JsonDecodeException(str(error)) from error
+
+
+_MISSING = object()
+_EXCLUDED = object()
+_CHUNK_SIZE = 1024
+
+
+class SchemaValidationException(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Field:
+    """
+    Describes how one attribute of a model is read from a payload.
+    path is the key in the payload, use dots to reach nested keys and numbers for list positions
+    e.g. 'subLista.0.tipoInvestimento' (a number still matches a dict key such as '2023').
+    convert is a function, or a dict mapping payload values to model values (unmapped values are invalid).
+    records with a raw value in exclude are dropped (None when decoding a single record).
+    """
+    name: str
+    path: str
+    default: Any = None
+    default_factory: Callable = None
+    convert: Callable | dict = None
+    required: bool = False
+    exclude: frozenset = None
+
+
+def compile_decoder(factory: Callable, fields: list[Field]) -> Callable[[dict], Any]:
+    """
+    Compiles the fields into a function that builds the model from a payload dict.
+    paths, defaults and conversions are resolved once here instead of for every record.
+    """
+    decode_record = _record_decoder(factory, fields)
+
+    def decode(payload: dict):
+        record = decode_record(payload)
+        return None if record is _EXCLUDED else record
+    return decode
+
+
+def compile_list_decoder(factory: Callable, fields: list[Field]) -> Callable[[list], list]:
+    """
+    Same as compile_decoder for a list of records, excluded records are left out.
+    The list is decoded column by column: excluded records are filtered out first, then every field is
+    read, converted and the models are built by chained map calls, so the per record loops run in C.
+    When a record misses a top level key or has an unmapped value its chunk is decoded record by record,
+    which fills the defaults or raises SchemaValidationException.
+    """
+    decode_record = _record_decoder(factory, fields)
+    build = _builder(factory, fields)
+    excludes = [(None if '.' in field.path else field.path, _keys(field), frozenset(field.exclude))
+                for field in fields if field.exclude]
+    columns = []
+    for field in fields:
+        if '.' in field.path:
+            columns.append((None, _keys(field), _finisher(field)))
+        else:
+            convert = field.convert.__getitem__ if isinstance(field.convert, dict) else field.convert
+            columns.append((itemgetter(field.path), None, convert))
+
+    def decode_chunk(payloads: list) -> list:
+        records = payloads
+        try:
+            # exclusions are checked before any conversion so dropped records cost only the reads
+            for key, path, exclude in excludes:
+                if key is None:
+                    records = [record for record in records if _walk(record, path) not in exclude]
+                else:
+                    records = [record for record in records if record[key] not in exclude]
+            values = []
+            for getter, path, convert in columns:
+                column = map(_walk, records, repeat(path)) if getter is None else map(getter, records)
+                values.append(column if convert is None else map(convert, column))
+            return list(map(build, *values))
+        except (KeyError, TypeError):
+            return [record for record in map(decode_record, payloads) if record is not _EXCLUDED]
+
+    def decode(payloads: list) -> list:
+        # chunks keep the records of every pass in the cpu cache
+        payloads = payloads or []
+        records = []
+        for start in range(0, len(payloads), _CHUNK_SIZE):
+            records.extend(decode_chunk(payloads[start:start + _CHUNK_SIZE]))
+        return records
+    return decode
+
+
+def _record_decoder(factory: Callable, fields: list[Field]) -> Callable[[dict], Any]:
+    build = _builder(factory, fields)
+    # fields without conversion, default or requirement are read as is, a missing value is already None
+    plain = [field.convert is None and field.default is None and field.default_factory is None and not field.required
+             for field in fields]
+    readers = [_reader(field, None if is_plain else _MISSING) for field, is_plain in zip(fields, plain)]
+    finishers = [None if is_plain else _finisher(field) for field, is_plain in zip(fields, plain)]
+    excludes = [(index, frozenset(field.exclude)) for index, field in enumerate(fields) if field.exclude]
+
+    def decode(payload: dict):
+        values = [read(payload) for read in readers]
+        # exclusions are checked before any conversion so dropped records cost only the reads
+        for index, exclude in excludes:
+            if values[index] in exclude:
+                return _EXCLUDED
+        return build(*[value if finish is None else finish(value) for finish, value in zip(finishers, values)])
+    return decode
+
+
+def _builder(factory: Callable, fields: list[Field]) -> Callable[..., Any]:
+    """The factory itself when the fields are its leading dataclass fields, so models are built with positional arguments"""
+    names = [field.name for field in fields]
+    if is_dataclass(factory) and names == [field.name for field in dataclass_fields(factory)][:len(names)]:
+        return factory
+    return lambda *values: factory(**dict(zip(names, values)))
+
+
+def _keys(field: Field) -> tuple:
+    """(key, index) pairs of the path, numeric segments are only used as an index when the value is a list"""
+    return tuple((key, int(key) if key.isdigit() else None) for key in field.path.split('.'))
+
+
+def _reader(field: Field, missing=_MISSING) -> Callable[[dict], Any]:
+    keys = _keys(field)
+    if len(keys) == 1:
+        key = field.path
+        return lambda payload: payload.get(key, missing)
+    return lambda payload: _walk(payload, keys, missing)
+
+
+def _finisher(field: Field) -> Callable[[Any], Any]:
+    convert = field.convert
+    if isinstance(convert, dict):
+        convert = _mapping(dict(convert), field.path)
+
+    def finish(value):
+        if value is _MISSING:
+            if field.required:
+                _missing(field.path)
+            return field.default_factory() if field.default_factory is not None else field.default
+        return value if convert is None else convert(value)
+    return finish
+
+
+def _mapping(mapping: dict, path: str) -> Callable[[Any], Any]:
+    def convert(value):
+        try:
+            return mapping[value]
+        except (KeyError, TypeError):
+            raise SchemaValidationException(f'unexpected value {value!r} for field {path!r}') from None
+    return convert
+
+
+def _missing(path: str):
+    raise SchemaValidationException(f'missing required field {path!r}')
+
+
+def _walk(payload, keys: tuple, missing=_MISSING):
+    for key, index in keys:
+        if isinstance(payload, dict):
+            payload = payload.get(key, _MISSING)
+        elif isinstance(payload, list) and index is not None and index < len(payload):
+            payload = payload[index]
+        else:
+            return missing
+        if payload is _MISSING:
+            return missing
+    return payload
@@ -1,8 +1,13 @@
 import click
+import datetime
+import os
 import pickle
 from services import itau_service
-from helpers.formatter_helper import format_money_brl
+from helpers.formatter_helper import format_money_brl, format_to_brl_date
 from services.itau_service import SessionExpiredException
+from services.position_history_service import PositionHistory
+from services.account_store_service import AccountStore, AccountStoreException
+from services.categorizer_service import Categorizer, CategoryRuleException, category_totals, load_rules
 from models.bank_model import BankAccount
 from models.auth_model import AuthCredentials
 
@@ -11,49 +16,77 @@ def commands():
     """Scraper para obter informações de contas (pessoa física) no banco Itaú"""
     pass
 
-def __account_file(file_path: str = None) -> str:
-    """Returns the file name for the account file"""
-    file_name = f'bank_account.pkl'
+def __store_file(file_path: str = None) -> str:
+    """Returns the file name for the account store"""
+    file_name = 'accounts.store'
     if file_path:
         return f'{file_path}/{file_name}'
     return file_name
 
-def __credentials_file(file_path: str = None) -> str:
-    """Returns the file name for the credentials file"""
-    file_name = 'credentials.pkl'
+def __legacy_file(file_name: str, file_path: str = None) -> str:
+    """Returns the file name of the pickle files used before the account store"""
+    if file_path:
+        return f'{file_path}/{file_name}'
+    return file_name
+
+def __history_file(file_path: str = None) -> str:
+    """Returns the file name for the investment positions history"""
+    file_name = 'positions_history.db'
     if file_path:
         return f'{file_path}/{file_name}'
     return file_name
 
 def save_credentials(bank_account: BankAccount, credentials: AuthCredentials, file_path=None) -> None:
-    """Saves the credentials and bank account to a file"""
+    """Saves the credentials and bank account to the account store"""
     if bank_account is None:
         raise Exception('Bank account information needs to be avalilable')
-    
-    credentials_file = __credentials_file(file_path)
-    account_file = __account_file(file_path)
 
-    if credentials is not None:
-        with open(credentials_file, 'wb') as file:
-            pickle.dump(credentials, file, pickle.HIGHEST_PROTOCOL)
-    
-    with open(account_file, 'wb') as file:
-        pickle.dump(bank_account, file, pickle.HIGHEST_PROTOCOL)
+    try:
+        store = AccountStore(__store_file(file_path))
+    except AccountStoreException:
+        # an unreadable store has nothing to keep, it is replaced by the new one
+        store = AccountStore(__store_file(file_path), overwrite=True)
+
+    with store:
+        if credentials is not None:
+            store.put('credentials', credentials)
+        store.put('bank_account', bank_account)
+        store.commit()
 
 def load_saved_credentials(file_path=None) -> None:
     global bank_account, credentials
 
-    credentials_file = __credentials_file(file_path)
-    account_file = __account_file(file_path)
-
     try:
-        with open(credentials_file, 'rb') as file:
-            credentials = pickle.load(file)
-        with open(account_file, 'rb') as file:
-            bank_account = pickle.load(file)
+        if not os.path.exists(__store_file(file_path)):
+            __migrate_legacy_files(file_path)
+        with AccountStore(__store_file(file_path)) as store:
+            credentials = store.get('credentials')
+            bank_account = store.get('bank_account')
+    except AccountStoreException as error:
+        print(f'Não foi possível ler os dados salvos ({error}), é necessário realizar o login novamente')
     finally:
         return
 
+def __migrate_legacy_files(file_path=None) -> None:
+    """Moves the credentials saved with pickle by older versions to the account store"""
+    account_file = __legacy_file('bank_account.pkl', file_path)
+    credentials_file = __legacy_file('credentials.pkl', file_path)
+    if not os.path.exists(account_file):
+        return
+
+    with open(account_file, 'rb') as file:
+        legacy_account = pickle.load(file)
+    legacy_credentials = None
+    if os.path.exists(credentials_file):
+        with open(credentials_file, 'rb') as file:
+            legacy_credentials = pickle.load(file)
+    save_credentials(legacy_account, legacy_credentials, file_path)
+
+    # the store is committed, the pickle files (password included) are no longer needed
+    for legacy_file in (account_file, credentials_file):
+        if os.path.exists(legacy_file):
+            os.remove(legacy_file)
+
 # credentials that will be loaded from the file ( if exists )
 bank_account: BankAccount = None
 credentials: AuthCredentials = None 
@@ -95,6 +128,31 @@ def extrato() -> None:
     for transaction in extrato.transactions:
         print(f'{transaction.date} - {transaction.type} - {format_money_brl(transaction.value)} - {transaction.description}')
 
+@click.command()
+@click.option('--regras', type=click.STRING, default='categorias.json', help='Arquivo json com as regras de categorização')
+def categorias(regras: str) -> None:
+    """Total das transações dos últimos 90 dias por categoria"""
+    __validate_credentials()
+    if not os.path.exists(regras):
+        print(f'Arquivo de regras {regras} não encontrado')
+        exit(1)
+    try:
+        categorizer = Categorizer(load_rules(regras), default_category='Sem categoria')
+    except CategoryRuleException as error:
+        print(f'Regras inválidas em {regras}: {error}')
+        exit(1)
+
+    extrato = None
+    try:
+        extrato = itau_service.account_statement(credentials)
+    except SessionExpiredException:
+        session_expired()
+
+    transactions = categorizer.tag(extrato.transactions)
+    print('## Categoria - Valor ##')
+    for category, total in category_totals(transactions).items():
+        print(f'{category} - {format_money_brl(total)}')
+
 @click.command()
 def saldo() -> None:
     """Saldo disponível em conta"""
@@ -132,6 +190,10 @@ def investimentos() -> None:
     except:
         session_expired()
 
+    history = PositionHistory(__history_file())
+    history.record_investments(investments)
+    history.close()
+
     print('## Ticker - Valor - Nome ##')
     for investment in investments:
         print(f'{investment.percentage}%  - {investment.category} - {format_money_brl(investment.amount)}')
@@ -146,10 +208,32 @@ def fiis() -> None:
     except:
         session_expired()
 
+    history = PositionHistory(__history_file())
+    history.record_assets(fiis)
+    history.close()
+
     print('## Percentual - Categoria - Valor ##')
     for fii in fiis:
         print(f'{fii.code} - {format_money_brl(fii.amount)} - {fii.name}')
 
+@click.command()
+@click.argument('codigo', type=click.STRING, required=False)
+def historico(codigo: str) -> None:
+    """Histórico dos investimentos consultados (total por dia ou de um ativo)"""
+    history = PositionHistory(__history_file())
+    if codigo:
+        print(f'## Data - Valor de {codigo} ##')
+        for taken_at, amount in history.asset_history(codigo):
+            print(f'{datetime.datetime.fromtimestamp(taken_at):%d/%m/%Y %H:%M} - {format_money_brl(amount)}')
+    else:
+        print('## Data - Valor total ##')
+        for day, total in history.daily_totals():
+            print(f'{format_to_brl_date(day)} - {format_money_brl(total)}')
+        print('## Variação da alocação por categoria (p.p.) ##')
+        for category, drift in history.category_drift().items():
+            print(f'{category} - {drift:+.2f}')
+    history.close()
+
 def __validate_credentials():
     global bank_account, credentials
     if credentials is None and bank_account is None:
@@ -166,9 +250,11 @@ def session_expired():
 commands.add_command(login)
 commands.add_command(saldo)
 commands.add_command(extrato)
+commands.add_command(categorias)
 commands.add_command(cartoes)
 commands.add_command(fiis)
 commands.add_command(investimentos)
+commands.add_command(historico)
 commands.add_command(atualizar_credenciais)
 
 if __name__ == '__main__':
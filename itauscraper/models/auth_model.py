@@ -12,4 +12,33 @@ class AuthCredentials:
     itau_router_url: str = None
     x_client_id: str = None
     x_auth_token: str = None
-    operationCodes: Operation = None
\ No newline at end of file
+    operationCodes: Operation = None
+
+
+# Compact variants of the models above, used to keep many accounts in memory and in the account store.
+
+@dataclass(frozen=True, slots=True)
+class FrozenOperation:
+    cards_list: str = None
+    cards_consolidated_statement: str = None
+    account_statement: str = None
+    investments: str = None
+
+    @classmethod
+    def from_model(cls, operation: Operation) -> 'FrozenOperation':
+        return cls(operation.cards_list, operation.cards_consolidated_statement,
+                   operation.account_statement, operation.investments)
+
+@dataclass(frozen=True, slots=True)
+class FrozenAuthCredentials:
+    itau_router_url: str = None
+    x_client_id: str = None
+    x_auth_token: str = None
+    operationCodes: FrozenOperation = None
+
+    @classmethod
+    def from_model(cls, credentials: AuthCredentials) -> 'FrozenAuthCredentials':
+        operation_codes = credentials.operationCodes
+        if operation_codes is not None and not isinstance(operation_codes, FrozenOperation):
+            operation_codes = FrozenOperation.from_model(operation_codes)
+        return cls(credentials.itau_router_url, credentials.x_client_id, credentials.x_auth_token, operation_codes)
@@ -1,4 +1,6 @@
+import sys
 from dataclasses import dataclass
+from enum import Enum
 
 @dataclass
 class Statement:
@@ -6,6 +8,7 @@ class Statement:
     description: str = None
     value: float = None
     type: str = None
+    category: str = None
 
 @dataclass
 class BankAccount:
@@ -50,3 +53,54 @@ class Investment:
     assets: list[Asset] = None
 
 
+class StatementType(str, Enum):
+    INCOMING = 'entrada'
+    OUTGOING = 'saida'
+
+
+# Compact variants of the models above, used to keep many accounts in memory and in the account store.
+# Repeated strings are interned so every statement with the same description shares one string.
+
+@dataclass(frozen=True, slots=True)
+class FrozenStatement:
+    date: str = None
+    description: str = None
+    value: float = None
+    type: StatementType = None
+    category: str = None
+
+    def __post_init__(self):
+        if self.date is not None:
+            object.__setattr__(self, 'date', sys.intern(self.date))
+        if self.description is not None:
+            object.__setattr__(self, 'description', sys.intern(self.description))
+        if self.type is not None and type(self.type) is not StatementType:
+            object.__setattr__(self, 'type', StatementType(self.type))
+        if self.category is not None:
+            object.__setattr__(self, 'category', sys.intern(self.category))
+
+    @classmethod
+    def from_model(cls, statement: Statement) -> 'FrozenStatement':
+        return cls(statement.date, statement.description, statement.value, statement.type, statement.category)
+
+@dataclass(frozen=True, slots=True)
+class FrozenBankAccount:
+    agency: str = None
+    account: str = None
+    password: str = None
+
+    @classmethod
+    def from_model(cls, bank_account: BankAccount) -> 'FrozenBankAccount':
+        return cls(bank_account.agency, bank_account.account, bank_account.password)
+
+@dataclass(frozen=True, slots=True)
+class FrozenAccountStatement:
+    available_balance: float = None
+    transactions: tuple[FrozenStatement, ...] = ()
+
+    @classmethod
+    def from_model(cls, account_statement: AccountStatement) -> 'FrozenAccountStatement':
+        return cls(
+            account_statement.available_balance,
+            tuple(FrozenStatement.from_model(statement) for statement in account_statement.transactions or [])
+        )
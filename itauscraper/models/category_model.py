@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+from enum import Enum
+
+class RuleKind(str, Enum):
+    SUBSTRING = 'substring'
+    PREFIX = 'prefix'
+    REGEX = 'regex'
+
+@dataclass
+class CategoryRule:
+    category: str = None
+    pattern: str = None
+    kind: RuleKind = RuleKind.SUBSTRING
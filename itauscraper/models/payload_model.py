@@ -0,0 +1,65 @@
+from helpers.formatter_helper import brl_str_to_float, format_to_brl_date
+from helpers.schema_helper import Field, compile_decoder, compile_list_decoder
+from models.bank_model import AccountStatement, Asset, CreditCard, Investment, OpenCreditCardInvoice, Statement
+
+# lines of the account statement that are daily balances instead of transactions
+SKIP_STATEMENT_DESCRIPTIONS = frozenset(['SDO CTA/APL AUTOMATICAS', 'SALDO DO DIA'])
+CATEGORY_FII = 'investimentosimobiliarios'
+
+
+def _description(description: str) -> str:
+    return description if description is not None else '###'
+
+
+decode_statements = compile_list_decoder(Statement, [
+    Field('date', 'dataLancamento', required=True, exclude={None}),
+    Field('description', 'descricaoLancamento', required=True, exclude=SKIP_STATEMENT_DESCRIPTIONS,
+          convert=_description),
+    Field('value', 'valorLancamento', required=True, exclude={None}, convert=brl_str_to_float),
+    Field('type', 'ePositivo', required=True, convert={True: 'entrada', False: 'saida', None: 'saida'}),
+])
+
+decode_account_statement = compile_decoder(AccountStatement, [
+    Field('available_balance', 'saldoResumido.saldoContaCorrente.valor', required=True, convert=brl_str_to_float),
+    Field('transactions', 'lancamentos', default_factory=list, convert=decode_statements),
+])
+
+decode_invoice = compile_decoder(OpenCreditCardInvoice, [
+    Field('total', 'valorAberto', convert=brl_str_to_float),
+    Field('due_date', 'dataVencimento', convert=format_to_brl_date),
+    Field('close_date', 'dataFechamentoFatura', convert=format_to_brl_date),
+])
+
+
+def _current_invoice(invoices: list[dict]) -> OpenCreditCardInvoice:
+    """The open invoice of the card, or the last closed one when there is no open invoice"""
+    for status in ('aberta', 'fechada'):
+        for invoice in invoices or []:
+            if invoice['status'] == status:
+                return decode_invoice(invoice)
+    return None
+
+
+decode_credit_card = compile_decoder(CreditCard, [
+    Field('id', 'id', required=True),
+    Field('name', 'nome'),
+    Field('last_digits', 'numero'),
+    Field('expiration_date', 'vencimento', convert=format_to_brl_date),
+    Field('total_limit', 'limites.limiteCreditoValor', convert=brl_str_to_float),
+    Field('used_limit', 'limites.limiteCreditoUtilizadoValor', convert=brl_str_to_float),
+    Field('available_limit', 'limites.limiteCreditoDisponivelValor', convert=brl_str_to_float),
+    Field('open_invoice', 'faturas', convert=_current_invoice),
+])
+
+decode_assets = compile_list_decoder(Asset, [
+    Field('code', 'codigoProduto', default='Unknown'),
+    Field('name', 'nomeProduto', default='Unknown'),
+    Field('amount', 'valorInvestidoGrafico', default=0.0),
+])
+
+decode_investments = compile_list_decoder(Investment, [
+    Field('category', 'subLista.0.tipoInvestimento', default='Unknown'),
+    Field('amount', 'valorParaGrafico', default=0.0),
+    Field('percentage', 'percentualTotal', default=0.0),
+    Field('assets', 'subLista', default_factory=list, convert=decode_assets),
+])
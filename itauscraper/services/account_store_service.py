@@ -0,0 +1,401 @@
+"""Binary store for bank accounts, credentials and statements.
+
+layout of the file:
+    header   magic (4s) | format version (H) | index offset (Q)
+    records  one blob per key, read only when the key is requested
+    index    count (I) | per key: key length (H) | key | offset (Q) | length (I)
+
+each record has its own string table, so repeated descriptions and field names are stored once per record.
+lists of models (e.g. the transactions of a statement) are stored by column, one array per field.
+objects are written with their field names and a schema version, fields added or removed from the models
+are handled when reading and older schemas are upgraded through MIGRATIONS.
+"""
+import mmap
+import os
+import struct
+import tempfile
+from dataclasses import fields
+from models.auth_model import AuthCredentials, FrozenAuthCredentials, FrozenOperation, Operation
+from models.bank_model import (AccountStatement, BankAccount, FrozenAccountStatement, FrozenBankAccount,
+                               FrozenStatement, Statement)
+
+MAGIC = b'ITAU'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHQ')
+INDEX_ENTRY = struct.Struct('<QI')
+
+# kind of each object stored, the frozen variant is the one built when reading
+KINDS = {
+    1: FrozenBankAccount,
+    2: FrozenOperation,
+    3: FrozenAuthCredentials,
+    4: FrozenStatement,
+    5: FrozenAccountStatement,
+}
+MODEL_KINDS = {
+    BankAccount: 1, FrozenBankAccount: 1,
+    Operation: 2, FrozenOperation: 2,
+    AuthCredentials: 3, FrozenAuthCredentials: 3,
+    Statement: 4, FrozenStatement: 4,
+    AccountStatement: 5, FrozenAccountStatement: 5,
+}
+# current schema version of each kind, bump it and add a migration when a model changes
+SCHEMA_VERSIONS = {kind: 1 for kind in KINDS}
+# (kind, version) -> function upgrading the fields dict from version to version + 1
+MIGRATIONS = {}
+
+_NONE, _STR, _FLOAT, _INT, _TRUE, _FALSE, _OBJECT, _LIST, _TABLE, _VALUES = range(10)
+_U8 = struct.Struct('<B')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_F64 = struct.Struct('<d')
+_I64 = struct.Struct('<q')
+_OBJECT_HEADER = struct.Struct('<BHH')
+_TABLE_HEADER = struct.Struct('<BHHI')
+
+
+class AccountStoreException(Exception):
+    pass
+
+
+class AccountStore:
+    """
+    Key/value store of models backed by a single file.
+    reads are done on demand from a memory-mapped file, writes replace the whole file atomically on commit.
+    """
+
+    def __init__(self, path: str, overwrite: bool = False):
+        """overwrite starts from an empty store, the existing file (even if unreadable) is replaced on commit"""
+        self.path = path
+        self.__overwrite = overwrite
+        self.__file = None
+        self.__mmap = None
+        self.__index: dict[str, tuple[int, int]] = {}
+        self.__pending: dict[str, bytes] = {}
+        self.__deleted: set[str] = set()
+        self.__open()
+
+    def __enter__(self) -> 'AccountStore':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __contains__(self, key: str) -> bool:
+        if key in self.__deleted:
+            return False
+        return key in self.__pending or key in self.__index
+
+    def keys(self) -> list[str]:
+        return [key for key in {**self.__index, **self.__pending} if key not in self.__deleted]
+
+    def get(self, key: str, default=None):
+        """Decodes only the record of the given key"""
+        if key not in self:
+            return default
+        if key in self.__pending:
+            return _decode_record(memoryview(self.__pending[key]))
+        offset, length = self.__index[key]
+        with memoryview(self.__mmap) as view, view[offset:offset + length] as record:
+            return _decode_record(record)
+
+    def put(self, key: str, value) -> None:
+        """Stores a model (or its frozen variant), the file is only written on commit"""
+        self.__pending[key] = _encode_record(value)
+        self.__deleted.discard(key)
+
+    def delete(self, key: str) -> None:
+        self.__pending.pop(key, None)
+        self.__deleted.add(key)
+
+    def commit(self) -> None:
+        """Writes every record to a temporary file that replaces the store file once it is complete"""
+        view = memoryview(self.__mmap) if self.__mmap is not None else None
+        records: dict[str, bytes | memoryview] = {}
+        for key, (offset, length) in self.__index.items():
+            records[key] = view[offset:offset + length]
+        records.update(self.__pending)
+        for key in self.__deleted:
+            records.pop(key, None)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.store')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                self.__write(file, records)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        finally:
+            # the mapped file can only be closed once no view of it is alive
+            for record in records.values():
+                if isinstance(record, memoryview):
+                    record.release()
+            if view is not None:
+                view.release()
+
+        self.close()
+        os.replace(temp_path, self.path)
+        self.__sync_directory(directory)
+        self.__overwrite = False
+        self.__pending.clear()
+        self.__deleted.clear()
+        self.__open()
+
+    def __write(self, file, records: dict[str, bytes | memoryview]) -> None:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0))
+        index = []
+        for key, record in records.items():
+            index.append((key, file.tell(), len(record)))
+            file.write(record)
+        index_offset = file.tell()
+        file.write(_U32.pack(len(index)))
+        for key, offset, length in index:
+            encoded_key = key.encode()
+            file.write(_U16.pack(len(encoded_key)) + encoded_key + INDEX_ENTRY.pack(offset, length))
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, index_offset))
+        file.flush()
+        os.fsync(file.fileno())
+
+    def __sync_directory(self, directory: str) -> None:
+        """Makes the rename durable, directories can not be opened for fsync on Windows"""
+        if os.name == 'nt':
+            return
+        descriptor = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def close(self) -> None:
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+        self.__index = {}
+
+    def __open(self) -> None:
+        if self.__overwrite or not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        self.__file = open(self.path, 'rb')
+        self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.__read_index()
+        except AccountStoreException:
+            self.close()
+            raise
+
+    def __read_index(self) -> None:
+        size = len(self.__mmap)
+        if size < HEADER.size:
+            raise AccountStoreException(f'{self.path} is truncated')
+        magic, version, index_offset = HEADER.unpack_from(self.__mmap, 0)
+        if magic != MAGIC:
+            raise AccountStoreException(f'{self.path} is not an account store')
+        if version > FORMAT_VERSION:
+            raise AccountStoreException(f'{self.path} uses format version {version}, supported up to {FORMAT_VERSION}')
+        if index_offset < HEADER.size or index_offset + _U32.size > size:
+            raise AccountStoreException(f'{self.path} has an invalid index offset {index_offset}')
+
+        position = index_offset
+        (count,) = _U32.unpack_from(self.__mmap, position)
+        position += _U32.size
+        for _ in range(count):
+            if position + _U16.size > size:
+                raise AccountStoreException(f'{self.path} has a truncated index')
+            (key_length,) = _U16.unpack_from(self.__mmap, position)
+            position += _U16.size
+            if position + key_length + INDEX_ENTRY.size > size:
+                raise AccountStoreException(f'{self.path} has a truncated index')
+            try:
+                key = self.__mmap[position:position + key_length].decode()
+            except UnicodeDecodeError:
+                raise AccountStoreException(f'{self.path} has an invalid key in the index') from None
+            position += key_length
+            offset, length = INDEX_ENTRY.unpack_from(self.__mmap, position)
+            position += INDEX_ENTRY.size
+            # records are stored between the header and the index
+            if offset < HEADER.size or offset + length > index_offset:
+                raise AccountStoreException(f'{self.path} has an invalid record position for {key!r}')
+            self.__index[key] = (offset, length)
+
+
+def _encode_record(value) -> bytes:
+    strings: dict[str, int] = {}
+    body = bytearray()
+    _encode_value(value, body, strings)
+
+    table = bytearray(_U32.pack(len(strings)))
+    for string in strings:
+        encoded = string.encode()
+        table += _U32.pack(len(encoded)) + encoded
+    return bytes(table + body)
+
+
+def _encode_value(value, body: bytearray, strings: dict[str, int]) -> None:
+    if value is None:
+        body += _U8.pack(_NONE)
+    elif isinstance(value, bool):
+        body += _U8.pack(_TRUE if value else _FALSE)
+    elif isinstance(value, str):
+        # enum members are stored by their value
+        body += _U8.pack(_STR) + _U32.pack(strings.setdefault(str.__str__(value), len(strings)))
+    elif isinstance(value, float):
+        body += _U8.pack(_FLOAT) + _F64.pack(value)
+    elif isinstance(value, int):
+        body += _U8.pack(_INT) + _I64.pack(value)
+    elif isinstance(value, (list, tuple)) and len(value) > 0 and _same_model(value):
+        _encode_table(value, body, strings)
+    elif isinstance(value, (list, tuple)):
+        body += _U8.pack(_LIST) + _U32.pack(len(value))
+        for item in value:
+            _encode_value(item, body, strings)
+    elif type(value) in MODEL_KINDS:
+        kind = MODEL_KINDS[type(value)]
+        model_fields = fields(value)
+        body += _U8.pack(_OBJECT) + _OBJECT_HEADER.pack(kind, SCHEMA_VERSIONS[kind], len(model_fields))
+        for field in model_fields:
+            body += _U32.pack(strings.setdefault(field.name, len(strings)))
+            _encode_value(getattr(value, field.name), body, strings)
+    else:
+        raise AccountStoreException(f'{type(value).__name__} can not be stored')
+
+
+def _same_model(values) -> bool:
+    model = type(values[0])
+    return model in MODEL_KINDS and all(type(value) is model for value in values)
+
+
+def _encode_table(values, body: bytearray, strings: dict[str, int]) -> None:
+    kind = MODEL_KINDS[type(values[0])]
+    model_fields = fields(values[0])
+    body += _U8.pack(_TABLE) + _TABLE_HEADER.pack(kind, SCHEMA_VERSIONS[kind], len(model_fields), len(values))
+    for field in model_fields:
+        body += _U32.pack(strings.setdefault(field.name, len(strings)))
+        column = [getattr(value, field.name) for value in values]
+        if all(item is None or isinstance(item, str) for item in column):
+            # string indexes are shifted by one so 0 can stand for None
+            body += _U8.pack(_STR) + struct.pack(f'<{len(column)}I', *[
+                0 if item is None else strings.setdefault(str.__str__(item), len(strings)) + 1 for item in column])
+        elif all(type(item) is float for item in column):
+            body += _U8.pack(_FLOAT) + struct.pack(f'<{len(column)}d', *column)
+        else:
+            body += _U8.pack(_VALUES)
+            for item in column:
+                _encode_value(item, body, strings)
+
+
+def _decode_table(record: memoryview, position: int, strings: list[str]):
+    kind, version, field_count, count = _TABLE_HEADER.unpack_from(record, position)
+    position += _TABLE_HEADER.size
+    names, columns = [], []
+    for _ in range(field_count):
+        (name,), (column_type,) = _U32.unpack_from(record, position), _U8.unpack_from(record, position + _U32.size)
+        position += _U32.size + _U8.size
+        names.append(strings[name])
+        if column_type == _STR:
+            lookup = [None, *strings]
+            columns.append([lookup[index] for index in struct.unpack_from(f'<{count}I', record, position)])
+            position += count * _U32.size
+        elif column_type == _FLOAT:
+            columns.append(struct.unpack_from(f'<{count}d', record, position))
+            position += count * _F64.size
+        else:
+            column = []
+            for _ in range(count):
+                item, position = _decode_value(record, position, strings)
+                column.append(item)
+            columns.append(column)
+
+    if kind not in KINDS or version != SCHEMA_VERSIONS[kind]:
+        return tuple(_build(kind, version, dict(zip(names, row))) for row in zip(*columns)), position
+    model = KINDS[kind]
+    model_names = [field.name for field in fields(model)]
+    if names == model_names:
+        return tuple(map(model, *columns)), position
+    known = [index for index, name in enumerate(names) if name in model_names]
+    names = [names[index] for index in known]
+    columns = [columns[index] for index in known]
+    return tuple(model(**dict(zip(names, row))) for row in zip(*columns)), position
+
+
+def _decode_record(record: memoryview):
+    """Decodes a record, a corrupt one raises AccountStoreException instead of the error found while reading it"""
+    try:
+        return _read_record(record)
+    except (struct.error, IndexError, KeyError, TypeError, ValueError, RecursionError) as error:
+        # ValueError also covers UnicodeDecodeError and values rejected by the models
+        raise AccountStoreException(f'corrupt record: {error}') from None
+
+
+def _read_record(record: memoryview):
+    size = len(record)
+    if size < _U32.size:
+        raise AccountStoreException('record is truncated')
+    (count,) = _U32.unpack_from(record, 0)
+    position = _U32.size
+    if count * _U32.size > size - position:
+        raise AccountStoreException(f'string table of {count} strings does not fit in the record')
+    strings = []
+    for _ in range(count):
+        (length,) = _U32.unpack_from(record, position)
+        position += _U32.size
+        if position + length > size:
+            raise AccountStoreException('string table is truncated')
+        strings.append(str(record[position:position + length], 'utf-8'))
+        position += length
+    value, _ = _decode_value(record, position, strings)
+    return value
+
+
+def _decode_value(record: memoryview, position: int, strings: list[str]):
+    (tag,) = _U8.unpack_from(record, position)
+    position += _U8.size
+    if tag == _STR:
+        (index,) = _U32.unpack_from(record, position)
+        return strings[index], position + _U32.size
+    if tag == _FLOAT:
+        return _F64.unpack_from(record, position)[0], position + _F64.size
+    if tag == _NONE:
+        return None, position
+    if tag == _OBJECT:
+        kind, version, count = _OBJECT_HEADER.unpack_from(record, position)
+        position += _OBJECT_HEADER.size
+        values = {}
+        for _ in range(count):
+            (name,) = _U32.unpack_from(record, position)
+            values[strings[name]], position = _decode_value(record, position + _U32.size, strings)
+        return _build(kind, version, values), position
+    if tag == _LIST:
+        (count,) = _U32.unpack_from(record, position)
+        position += _U32.size
+        items = []
+        for _ in range(count):
+            item, position = _decode_value(record, position, strings)
+            items.append(item)
+        return tuple(items), position
+    if tag == _TABLE:
+        return _decode_table(record, position, strings)
+    if tag == _INT:
+        return _I64.unpack_from(record, position)[0], position + _I64.size
+    if tag == _TRUE or tag == _FALSE:
+        return tag == _TRUE, position
+    raise AccountStoreException(f'unknown value tag {tag}')
+
+
+def _build(kind: int, version: int, values: dict):
+    if kind not in KINDS:
+        raise AccountStoreException(f'unknown record kind {kind}')
+    if version > SCHEMA_VERSIONS[kind]:
+        raise AccountStoreException(f'record kind {kind} has schema version {version}, supported up to {SCHEMA_VERSIONS[kind]}')
+    while version < SCHEMA_VERSIONS[kind]:
+        values = MIGRATIONS[(kind, version)](values)
+        version += 1
+
+    model = KINDS[kind]
+    # fields that are no longer part of the model are dropped, new ones keep their default
+    known = {field.name for field in fields(model)}
+    return model(**{name: value for name, value in values.items() if name in known})
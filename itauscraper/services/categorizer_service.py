@@ -0,0 +1,188 @@
+import dataclasses
+import re
+from functools import lru_cache
+from helpers.schema_helper import Field, JsonDecodeException, compile_list_decoder, loads
+from models.bank_model import Statement
+from models.category_model import CategoryRule, RuleKind
+
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+RULE_KINDS = {kind.value: kind for kind in RuleKind}
+
+decode_rules = compile_list_decoder(CategoryRule, [
+    Field('category', 'category', required=True),
+    Field('pattern', 'pattern', required=True),
+    Field('kind', 'kind', default=RuleKind.SUBSTRING, convert=RULE_KINDS),
+])
+
+
+class CategoryRuleException(Exception):
+    pass
+
+
+def load_rules(file_path: str) -> list[CategoryRule]:
+    """Reads the rules from a json file: [{"category": ..., "pattern": ..., "kind": "substring|prefix|regex"}]"""
+    with open(file_path, 'rb') as file:
+        try:
+            payload = loads(file.read())
+        except JsonDecodeException as error:
+            raise CategoryRuleException(f'invalid json: {error}') from None
+
+    if not isinstance(payload, list):
+        raise CategoryRuleException('the rules must be a list')
+    for index, rule in enumerate(payload):
+        if not isinstance(rule, dict):
+            raise CategoryRuleException(f'rule {index} must be an object')
+        for key in ('category', 'pattern'):
+            if not isinstance(rule.get(key), str) or not rule[key]:
+                raise CategoryRuleException(f'rule {index} must have a non empty string {key!r}')
+        kind = rule.get('kind', RuleKind.SUBSTRING.value)
+        if not isinstance(kind, str) or kind not in RULE_KINDS:
+            raise CategoryRuleException(f'rule {index} has an unknown kind {kind!r}, use one of {sorted(RULE_KINDS)}')
+    return decode_rules(payload)
+
+
+class Categorizer:
+    """
+    Tags statements with the category of the first rule (in the given order) matching its description.
+    Every literal (substring and prefix patterns, and a literal required by each regex) is compiled into a
+    single Aho-Corasick automaton, so a description is scanned once no matter how many rules there are.
+    Substring and prefix patterns ignore case and repeated spaces, regexes run on the raw description ignoring case.
+    Regexes are only run when their literal is found (at most once per description),
+    regexes without any literal are run for every description.
+    """
+
+    def __init__(self, rules: list[CategoryRule], default_category: str = None, cache_size: int = 65536):
+        self.rules = list(rules)
+        self.default_category = default_category
+        self.__regexes: dict[int, re.Pattern] = {}
+        self.__unanchored: list[int] = []
+        literals: list[tuple[str, int]] = []
+
+        for index, rule in enumerate(self.rules):
+            if rule.kind == RuleKind.REGEX:
+                try:
+                    self.__regexes[index] = re.compile(rule.pattern, re.IGNORECASE)
+                except re.error as error:
+                    raise CategoryRuleException(f'rule {index} has an invalid regex {rule.pattern!r}: {error}') from None
+                anchor = self.__required_literal(rule.pattern)
+                if anchor:
+                    literals.append((anchor, index))
+                else:
+                    self.__unanchored.append(index)
+            elif rule.pattern:
+                literals.append((self.__normalize(rule.pattern), index))
+
+        self.__build_automaton(literals)
+        self.categorize = lru_cache(maxsize=cache_size)(self.__categorize)
+
+    def tag(self, statements: list[Statement]) -> list[Statement]:
+        """Sets the category of every statement, frozen statements are replaced by a tagged copy"""
+        tagged = []
+        for statement in statements:
+            category = self.categorize(statement.description or '')
+            if dataclasses.is_dataclass(statement) and type(statement).__dataclass_params__.frozen:
+                statement = dataclasses.replace(statement, category=category)
+            else:
+                statement.category = category
+            tagged.append(statement)
+        return tagged
+
+    def __categorize(self, description: str) -> str:
+        text = self.__normalize(description)
+        best = len(self.rules)
+        tested: set[int] = set()
+        for index, start in self.__scan(text):
+            # hits are checked from the first rule, nothing after a confirmed match can win
+            if index >= best:
+                continue
+            rule = self.rules[index]
+            if rule.kind == RuleKind.SUBSTRING:
+                best = index
+            elif rule.kind == RuleKind.PREFIX:
+                if start == 0:
+                    best = index
+            elif index not in tested:
+                # a literal can occur many times, the regex already searched the whole description
+                tested.add(index)
+                if self.__regexes[index].search(description):
+                    best = index
+
+        for index in self.__unanchored:
+            if index >= best:
+                break
+            if self.__regexes[index].search(description):
+                best = index
+
+        return self.rules[best].category if best < len(self.rules) else self.default_category
+
+    def __scan(self, text: str):
+        """Yields (rule index, start position) of every literal found in the text"""
+        goto, fail, output = self.__goto, self.__fail, self.__output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index, length in output[state]:
+                yield index, position - length + 1
+
+    def __build_automaton(self, literals: list[tuple[str, int]]) -> None:
+        goto: list[dict[str, int]] = [{}]
+        output: list[list[tuple[int, int]]] = [[]]
+        for literal, index in literals:
+            state = 0
+            for char in literal:
+                if char not in goto[state]:
+                    goto.append({})
+                    output.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            output[state].append((index, len(literal)))
+
+        # breadth first so the failure state of each node is ready before its children
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(char, 0)
+                output[child] = output[child] + output[fail[child]]
+
+        self.__goto = goto
+        self.__fail = fail
+        self.__output = [tuple(sorted(matches)) for matches in output]
+
+    def __normalize(self, text: str) -> str:
+        return ' '.join(text.upper().split())
+
+    def __required_literal(self, pattern: str) -> str:
+        """Longest run of literal characters at the top level of the regex, any match must contain it"""
+        try:
+            parsed = sre_parse.parse(pattern, re.IGNORECASE)
+        except re.error:
+            return None
+
+        longest, current = '', ''
+        for opcode, argument in parsed:
+            if opcode == sre_parse.LITERAL:
+                current += chr(argument)
+                if len(current) > len(longest):
+                    longest = current
+            else:
+                current = ''
+        return self.__normalize(longest) or None
+
+
+def category_totals(statements: list[Statement]) -> dict[str, float]:
+    """Sum of the statement values by category, ordered by the highest total"""
+    totals: dict[str, float] = {}
+    for statement in statements:
+        totals[statement.category] = totals.get(statement.category, 0.0) + (statement.value or 0.0)
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
@@ -1,8 +1,8 @@
-import json
 import requests
-from helpers.formatter_helper import brl_str_to_float, format_to_brl_date
+from helpers.schema_helper import loads
 from models.auth_model import AuthCredentials
-from models.bank_model import CreditCard, OpenCreditCardInvoice, AccountStatement, Statement, Investment, Asset
+from models.bank_model import CreditCard, AccountStatement, Investment, Asset
+from models.payload_model import CATEGORY_FII, decode_account_statement, decode_assets, decode_credit_card, decode_investments
 
 from services.itau_scraper_service import ItauScraper
 from helpers.formatter_helper import format_account_credentials
@@ -25,33 +25,7 @@ def account_statement(credentials: AuthCredentials) -> AccountStatement:
     if response.status_code != requests.codes.ok:
         return None
 
-    response_body = response.json()
-    invoice_statements = response_body['lancamentos']
-    account_statements: list[Statement] = []
-    for statement in invoice_statements:
-        date = statement['dataLancamento']
-        amount = statement['valorLancamento']
-        description = statement['descricaoLancamento']
-        incoming_amount = statement['ePositivo']
-
-        skip_description = ['SDO CTA/APL AUTOMATICAS', 'SALDO DO DIA']
-        if date is None or amount is None or description in skip_description:
-            continue
-        
-        account_statements.append(
-            Statement(
-                date=date,
-                description=description if description is not None else '###',
-                value=brl_str_to_float(amount),
-                type='entrada' if incoming_amount else 'saida'
-            )
-        )
-
-    balance = response_body['saldoResumido']["saldoContaCorrente"]["valor"]
-    return AccountStatement(
-        available_balance=float(balance.replace('.', '').replace(',', '.')),
-        transactions=account_statements
-    )
+    return decode_account_statement(loads(response.content))
 
 
 def account_balance(credentials: AuthCredentials) -> float:
@@ -64,41 +38,17 @@ def fiis(credentials: AuthCredentials) -> list[Asset]:
     investments = __generate_json_investments(credentials)
     fiis: list[Asset] = []
 
-    category_fii = "investimentosimobiliarios"
-
     for investment in investments:
-        if investment["tipoOrdenado"] != category_fii:
+        if investment["tipoOrdenado"] != CATEGORY_FII:
             continue
-
-        fiis.extend([Asset(
-                        code=asset['codigoProduto'] if 'codigoProduto' in asset else 'Unknown',
-                        name=asset['nomeProduto'] if 'nomeProduto' in asset else 'Unknown',
-                        amount=asset['valorInvestidoGrafico'] if 'valorInvestidoGrafico' in asset else 0.0,
-                    ) for asset in investment['subLista']])
+        fiis.extend(decode_assets(investment['subLista']))
     fiis.sort(key=lambda x: x.amount, reverse=True)
     return fiis
 
 def investiments(credentials: AuthCredentials) -> list[Investment]:
     """all consolidated investiments """
     investments = __generate_json_investments(credentials)
-    investiments_list: list[Investment] = []
-
-    for investment in investments:
-        investiments_list.append(
-            Investment(
-                category=investment["subLista"][0]["tipoInvestimento"] if 'tipoInvestimento' in investment["subLista"][0] else 'Unknown',
-                amount=investment['valorParaGrafico'] if 'valorParaGrafico' in investment else 0.0,
-                percentage=investment['percentualTotal'] if 'percentualTotal' in investment else 0.0,
-                assets=[
-                    Asset(
-                        code=asset['codigoProduto'] if 'codigoProduto' in asset else 'Unknown',
-                        name=asset['nomeProduto'] if 'nomeProduto' in asset else 'Unknown',
-                        amount=asset['valorInvestidoGrafico'] if 'valorInvestidoGrafico' in asset else 0.0,
-                    ) for asset in investment['subLista']
-                ]
-            )
-        )
-    return investiments_list
+    return decode_investments(investments)
 
 
 def list_credit_cards(credentials: AuthCredentials) -> list[CreditCard]:
@@ -110,7 +60,7 @@ def list_credit_cards(credentials: AuthCredentials) -> list[CreditCard]:
     response_cards_statement = itau_scrapper.credit_card_details(
         credentials=credentials,
         ids=[card['id']
-             for card in response_cards_list.json()['object']['data']]
+             for card in loads(response_cards_list.content)['object']['data']]
     )
 
     __validate_session(response_cards_statement)
@@ -118,36 +68,11 @@ def list_credit_cards(credentials: AuthCredentials) -> list[CreditCard]:
         return None
 
     credit_cards: list[CreditCard] = []
-    for card in response_cards_statement.json()['object']:
-        credit_card = CreditCard(
-            id=card['id'],
-            name=card['nome'],
-            last_digits=card['numero'],
-            expiration_date=format_to_brl_date(card['vencimento']),
-        )
-
-        limites = card['limites']
-        if limites is not None and len(limites) > 0:
-            credit_card.total_limit = brl_str_to_float(limites['limiteCreditoValor']),
-            credit_card.used_limit = brl_str_to_float(limites['limiteCreditoUtilizadoValor']),
-            credit_card.available_limit = brl_str_to_float(limites['limiteCreditoDisponivelValor']),
-
-        invoices = card['faturas']
-        if invoices is not None and len(invoices) > 0:
-            open_invoices = [
-                invoice for invoice in invoices if invoice['status'] == 'aberta']
-            closed_invoices = [ 
-                invoice for invoice in invoices if invoice['status'] == 'fechada']
-            
-            if len(open_invoices) == 0 and len(closed_invoices) == 0:
-                continue
-
-            credit_card.open_invoice = OpenCreditCardInvoice(
-                total=brl_str_to_float(open_invoices[0]['valorAberto']) if len(open_invoices) > 0 else brl_str_to_float(closed_invoices[0]['valorAberto']),
-                due_date=format_to_brl_date(open_invoices[0]['dataVencimento']) if len(open_invoices) > 0 else format_to_brl_date(closed_invoices[0]['dataVencimento']),
-                close_date=format_to_brl_date(open_invoices[0]['dataFechamentoFatura']) if len(open_invoices) > 0 else format_to_brl_date(closed_invoices[0]['dataFechamentoFatura']) 
-            )
-
+    for card in loads(response_cards_statement.content)['object']:
+        credit_card = decode_credit_card(card)
+        # cards with invoices that are neither open nor closed have nothing to show
+        if card['faturas'] and credit_card.open_invoice is None:
+            continue
         credit_cards.append(credit_card)
     return credit_cards
 
@@ -161,7 +86,7 @@ def __generate_json_investments(credentials: AuthCredentials):
 
     json_payload = investiments.text[start_index +
                                      len(start_str):end].strip() + ']'
-    return json.loads(json_payload)
+    return loads(json_payload)
 
 def __validate_session(response):
     if response.status_code != requests.codes.ok and 'foi encerrada por falta de' in response.text:
@@ -0,0 +1,139 @@
+import sqlite3
+import time
+from models.bank_model import Asset, Investment
+
+
+class PositionHistory:
+    """
+    Append-only store with a snapshot of every investment position fetched.
+    Each asset is kept as a row (code, timestamp, amount) covered by a single
+    index, so the history of one asset is read straight from the index.
+    Rows of the same fetch share a snapshot id, only complete snapshots (all the
+    investments) are used for the portfolio aggregations.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            snapshot INTEGER NOT NULL,
+            complete INTEGER NOT NULL,
+            taken_at INTEGER NOT NULL,
+            code TEXT NOT NULL,
+            category TEXT,
+            amount REAL NOT NULL,
+            percentage REAL
+        );
+        CREATE INDEX IF NOT EXISTS snapshots_code_taken_at
+            ON snapshots (code, taken_at, amount);
+        CREATE INDEX IF NOT EXISTS snapshots_complete_taken_at
+            ON snapshots (complete, taken_at, snapshot);
+        CREATE INDEX IF NOT EXISTS snapshots_snapshot
+            ON snapshots (snapshot);
+    """
+
+    # every row of the last complete snapshot of each day, used by the daily aggregations
+    DAILY_POSITIONS = """
+        SELECT day, code, category, amount FROM snapshots JOIN (
+            SELECT date(taken_at, 'unixepoch', 'localtime') AS day, MAX(snapshot) AS last
+            FROM snapshots
+            WHERE complete = 1 AND taken_at >= ? AND taken_at <= ?
+            GROUP BY day
+        ) ON snapshot = last
+    """
+
+    def __init__(self, db_path: str):
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def record_investments(self, investments: list[Investment], taken_at: int = None) -> int:
+        """Appends a snapshot of every asset inside each investment category"""
+        rows = []
+        for investment in investments:
+            for asset in investment.assets or []:
+                rows.append((asset.code, investment.category, asset.amount, investment.percentage))
+        return self.__append(rows, True, taken_at)
+
+    def record_assets(self, assets: list[Asset], taken_at: int = None) -> int:
+        """
+        Appends a snapshot of assets fetched without their category (e.g. fiis).
+        the category is carried over from the last snapshot of the same asset.
+        it is a partial snapshot, so it only shows up in the history of each asset.
+        """
+        return self.__append([(asset.code, None, asset.amount, None) for asset in assets], False, taken_at)
+
+    def asset_history(self, code: str, start: int = None, end: int = None) -> list[tuple[int, float]]:
+        """Returns the (timestamp, amount) of each snapshot of an asset"""
+        cursor = self.connection.execute(
+            'SELECT taken_at, amount FROM snapshots '
+            'WHERE code = ? AND taken_at >= ? AND taken_at <= ? ORDER BY taken_at',
+            (code, *self.__period(start, end))
+        )
+        return cursor.fetchall()
+
+    def daily_totals(self, start: int = None, end: int = None) -> list[tuple[str, float]]:
+        """Returns the portfolio total per day using the last complete snapshot of that day (fiis fetches are ignored)"""
+        cursor = self.connection.execute(
+            f'SELECT day, SUM(amount) FROM ({self.DAILY_POSITIONS}) GROUP BY day ORDER BY day',
+            self.__period(start, end)
+        )
+        return cursor.fetchall()
+
+    def category_allocation(self, start: int = None, end: int = None) -> dict[str, dict[str, float]]:
+        """Returns the percentage of the portfolio allocated to each category per day"""
+        cursor = self.connection.execute(
+            f'SELECT day, COALESCE(category, \'Unknown\'), SUM(amount) FROM ({self.DAILY_POSITIONS}) '
+            'GROUP BY day, category ORDER BY day',
+            self.__period(start, end)
+        )
+        allocation: dict[str, dict[str, float]] = {}
+        for day, category, amount in cursor:
+            categories = allocation.setdefault(day, {})
+            categories[category] = categories.get(category, 0.0) + amount
+
+        for categories in allocation.values():
+            total = sum(categories.values())
+            for category, amount in categories.items():
+                categories[category] = round(amount / total * 100, 2) if total else 0.0
+        return allocation
+
+    def category_drift(self, start: int = None, end: int = None) -> dict[str, float]:
+        """Returns how many percentage points each category moved between the first and last day"""
+        allocation = self.category_allocation(start, end)
+        if len(allocation) == 0:
+            return {}
+
+        days = sorted(allocation)
+        first, last = allocation[days[0]], allocation[days[-1]]
+        return {
+            category: round(last.get(category, 0.0) - first.get(category, 0.0), 2)
+            for category in sorted(first.keys() | last.keys())
+        }
+
+    def __append(self, rows: list[tuple], complete: bool, taken_at: int = None) -> int:
+        taken_at = int(time.time()) if taken_at is None else taken_at
+        with self.connection:
+            # take the write lock before reading the id, so concurrent fetches never share a snapshot
+            self.connection.execute('BEGIN IMMEDIATE')
+            (snapshot,) = self.connection.execute('SELECT COALESCE(MAX(snapshot), 0) + 1 FROM snapshots').fetchone()
+            self.connection.executemany(
+                'INSERT INTO snapshots (snapshot, complete, taken_at, code, category, amount, percentage) '
+                'VALUES (?, ?, ?, ?, COALESCE(?, (SELECT category FROM snapshots WHERE code = ? '
+                'ORDER BY taken_at DESC LIMIT 1)), ?, ?)',
+                [(snapshot, int(complete), taken_at, code, category, code,
+                  self.__to_float(amount) or 0.0, self.__to_float(percentage))
+                 for code, category, amount, percentage in rows]
+            )
+        return len(rows)
+
+    def __period(self, start: int = None, end: int = None) -> tuple[int, int]:
+        return (0 if start is None else start, 2**63 - 1 if end is None else end)
+
+    def __to_float(self, value) -> float:
+        """Values from the investments payload may come as numbers or BRL formatted strings"""
+        if value is None or isinstance(value, (int, float)):
+            return value
+        value = value.replace('%', '').strip()
+        if ',' in value:
+            value = value.replace('.', '').replace(',', '.')
+        return float(value)
@@ -0,0 +1,244 @@
+import os
+import tempfile
+import unittest
+from dataclasses import dataclass
+from unittest import mock
+from models.auth_model import AuthCredentials, FrozenAuthCredentials, FrozenOperation, Operation
+from models.bank_model import (AccountStatement, BankAccount, FrozenAccountStatement, FrozenBankAccount,
+                               FrozenStatement, Statement, StatementType)
+from services import account_store_service
+from services.account_store_service import HEADER, AccountStore, AccountStoreException, _decode_record, _encode_record
+
+
+@dataclass
+class OldBankAccount:
+    """BankAccount before the password field was added"""
+    agency: str = None
+    account: str = None
+
+
+@dataclass
+class NewBankAccount:
+    """BankAccount with a field the current model does not know"""
+    agency: str = None
+    account: str = None
+    password: str = None
+    nickname: str = None
+
+
+@dataclass
+class OldStatement:
+    date: str = None
+    value: float = None
+
+
+def _statements(count: int) -> list[Statement]:
+    return [Statement(f'{day % 28 + 1:02d}/07/2023', 'PIX TRANSF' if day % 2 else 'PAG BOLETO', day * 1.5,
+                      'entrada' if day % 3 else 'saida', None if day % 4 else 'Contas') for day in range(count)]
+
+
+def _body_tag(record: bytes) -> int:
+    """Tag of the top level value of an encoded record, found after its string table"""
+    view = memoryview(record)
+    position = 4
+    for _ in range(int.from_bytes(view[0:4], 'little')):
+        position += 4 + int.from_bytes(view[position:position + 4], 'little')
+    return view[position + 1] if view[position] == account_store_service._OBJECT else view[position]
+
+
+class AccountStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'accounts.store')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, **values) -> None:
+        with AccountStore(self.path) as store:
+            for key, value in values.items():
+                store.put(key, value)
+            store.commit()
+
+    def read(self, key: str):
+        with AccountStore(self.path) as store:
+            return store.get(key)
+
+    def test_round_trip_of_each_model_kind(self):
+        operation = Operation('cards', 'consolidated', 'statement', 'investments')
+        models = {
+            'bank_account': (BankAccount('1234', '56789-0', '123456'), FrozenBankAccount),
+            'operation': (operation, FrozenOperation),
+            'credentials': (AuthCredentials('https://router', 'client', 'token', operation), FrozenAuthCredentials),
+            'statement': (Statement('01/07/2023', 'PIX', 10.5, 'entrada', 'Pix'), FrozenStatement),
+            'account_statement': (AccountStatement(1234.56, _statements(50)), FrozenAccountStatement),
+        }
+        self.write(**{key: model for key, (model, _) in models.items()})
+
+        for key, (model, frozen) in models.items():
+            with self.subTest(key):
+                value = self.read(key)
+                self.assertIsInstance(value, frozen)
+                self.assertEqual(value, frozen.from_model(model))
+
+    def test_frozen_models_are_stored_as_is(self):
+        statement = FrozenAccountStatement.from_model(AccountStatement(10.0, _statements(3)))
+        self.write(statement=statement)
+        value = self.read('statement')
+        self.assertEqual(value, statement)
+        self.assertIsInstance(value.transactions[0].type, StatementType)
+
+    def test_lists_of_one_model_are_stored_as_tables(self):
+        statements = _statements(10)
+        self.assertEqual(_body_tag(_encode_record(statements)), account_store_service._TABLE)
+        self.assertEqual(_decode_record(memoryview(_encode_record(statements))),
+                         tuple(FrozenStatement.from_model(statement) for statement in statements))
+
+    def test_mixed_lists_are_stored_item_by_item(self):
+        values = [Statement('01/07/2023', 'PIX', 1.0, 'saida'), BankAccount('1', '2', '3'), 'text', 7, None, True]
+        self.assertEqual(_body_tag(_encode_record(values)), account_store_service._LIST)
+        self.assertEqual(_decode_record(memoryview(_encode_record(values))), (
+            FrozenStatement('01/07/2023', 'PIX', 1.0, StatementType.OUTGOING), FrozenBankAccount('1', '2', '3'),
+            'text', 7, None, True))
+        self.assertEqual(_decode_record(memoryview(_encode_record([]))), ())
+
+    def test_table_columns_with_mixed_values(self):
+        statements = [Statement('01/07/2023', 'PIX', 1.0, 'entrada'), Statement('02/07/2023', None, 2, 'saida')]
+        self.write(statements=statements)
+        self.assertEqual(self.read('statements'), tuple(FrozenStatement.from_model(statement)
+                                                        for statement in statements))
+
+    def test_record_missing_a_field_keeps_its_default(self):
+        with mock.patch.dict(account_store_service.MODEL_KINDS, {OldBankAccount: 1, OldStatement: 4}):
+            self.write(bank_account=OldBankAccount('1234', '56789-0'),
+                       statements=[OldStatement('01/07/2023', 1.0), OldStatement('02/07/2023', 2.0)])
+
+        self.assertEqual(self.read('bank_account'), FrozenBankAccount('1234', '56789-0', None))
+        self.assertEqual(self.read('statements'), (FrozenStatement('01/07/2023', value=1.0),
+                                                   FrozenStatement('02/07/2023', value=2.0)))
+
+    def test_record_with_an_unknown_field_drops_it(self):
+        with mock.patch.dict(account_store_service.MODEL_KINDS, {NewBankAccount: 1}):
+            self.write(bank_account=NewBankAccount('1234', '56789-0', '123456', 'principal'),
+                       accounts=[NewBankAccount('1', '2', '3', 'a'), NewBankAccount('4', '5', '6', 'b')])
+
+        self.assertEqual(self.read('bank_account'), FrozenBankAccount('1234', '56789-0', '123456'))
+        self.assertEqual(self.read('accounts'), (FrozenBankAccount('1', '2', '3'), FrozenBankAccount('4', '5', '6')))
+
+    def test_older_schema_versions_are_migrated(self):
+        self.write(bank_account=BankAccount('1234', '56789-0', '123456'))
+
+        def drop_password(values: dict) -> dict:
+            return {**values, 'password': None}
+        with mock.patch.dict(account_store_service.SCHEMA_VERSIONS, {1: 2}), \
+                mock.patch.dict(account_store_service.MIGRATIONS, {(1, 1): drop_password}):
+            self.assertEqual(self.read('bank_account'), FrozenBankAccount('1234', '56789-0', None))
+
+    def test_newer_schema_versions_are_rejected(self):
+        with mock.patch.dict(account_store_service.SCHEMA_VERSIONS, {1: 2}):
+            self.write(bank_account=BankAccount('1234', '56789-0', '123456'))
+        with self.assertRaises(AccountStoreException):
+            self.read('bank_account')
+
+    def test_pending_changes_are_only_written_on_commit(self):
+        self.write(bank_account=BankAccount('1', '2', '3'), credentials=AuthCredentials('url'))
+        with AccountStore(self.path) as store:
+            store.put('bank_account', BankAccount('4', '5', '6'))
+            store.delete('credentials')
+            self.assertEqual(store.get('bank_account'), FrozenBankAccount('4', '5', '6'))
+            self.assertNotIn('credentials', store)
+
+        self.assertEqual(self.read('bank_account'), FrozenBankAccount('1', '2', '3'))
+        self.assertEqual(self.read('credentials'), FrozenAuthCredentials('url'))
+
+    def test_unstorable_values_are_rejected(self):
+        with AccountStore(self.path) as store:
+            with self.assertRaises(AccountStoreException):
+                store.put('value', {'a': 1})
+
+
+class CorruptAccountStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'accounts.store')
+        with AccountStore(self.path) as store:
+            store.put('bank_account', BankAccount('1234', '56789-0', '123456'))
+            store.put('statement', AccountStatement(10.0, _statements(5)))
+            store.commit()
+        with open(self.path, 'rb') as file:
+            self.data = file.read()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def corrupt(self, data: bytes) -> None:
+        with open(self.path, 'wb') as file:
+            file.write(data)
+
+    def read_all(self) -> None:
+        with AccountStore(self.path) as store:
+            for key in store.keys():
+                store.get(key)
+
+    def assertUnreadable(self, data: bytes) -> None:
+        self.corrupt(data)
+        with self.assertRaises(AccountStoreException):
+            self.read_all()
+
+    def test_truncated_header(self):
+        self.assertUnreadable(self.data[:HEADER.size - 1])
+
+    def test_invalid_magic(self):
+        self.assertUnreadable(b'NOPE' + self.data[4:])
+
+    def test_newer_format_version(self):
+        magic, _, index_offset = HEADER.unpack_from(self.data)
+        self.assertUnreadable(HEADER.pack(magic, account_store_service.FORMAT_VERSION + 1, index_offset)
+                              + self.data[HEADER.size:])
+
+    def test_index_offset_out_of_the_file(self):
+        magic, version, _ = HEADER.unpack_from(self.data)
+        self.assertUnreadable(HEADER.pack(magic, version, len(self.data) + 100) + self.data[HEADER.size:])
+
+    def test_truncated_index(self):
+        self.assertUnreadable(self.data[:-3])
+
+    def test_string_table_larger_than_the_record(self):
+        data = bytearray(self.data)
+        data[HEADER.size:HEADER.size + 4] = (2**32 - 1).to_bytes(4, 'little')
+        self.assertUnreadable(bytes(data))
+
+    def test_string_longer_than_the_record(self):
+        data = bytearray(self.data)
+        data[HEADER.size + 4:HEADER.size + 8] = (2**31).to_bytes(4, 'little')
+        self.assertUnreadable(bytes(data))
+
+    def test_string_with_invalid_utf8(self):
+        data = bytearray(self.data)
+        data[HEADER.size + 8] = 0xff
+        self.assertUnreadable(bytes(data))
+
+    def test_every_corrupted_byte_is_read_or_reported(self):
+        for position in range(len(self.data)):
+            data = bytearray(self.data)
+            data[position] ^= 0xff
+            self.corrupt(bytes(data))
+            with self.subTest(position=position):
+                try:
+                    self.read_all()
+                except AccountStoreException:
+                    pass
+
+    def test_unreadable_store_can_be_overwritten(self):
+        self.corrupt(self.data[:10])
+        with AccountStore(self.path, overwrite=True) as store:
+            store.put('bank_account', BankAccount('1', '2', '3'))
+            store.commit()
+        with AccountStore(self.path) as store:
+            self.assertEqual(store.get('bank_account'), FrozenBankAccount('1', '2', '3'))
+
+
+if __name__ == '__main__':
+    unittest.main()